@@ -85,6 +85,7 @@ max_pdfs_to_process = 100
 max_searches_per_variety = 30
 confidence_threshold = 0.8
 batch_size = 10
+gemini_qps = 1
 EOF
     echo "Configuration template created at config/config.ini"
     echo "Please update config/config.ini with your API keys before running the pipeline"
@@ -15,8 +15,9 @@ import os
 import json
 import time
 import logging
-import pandas as pd
-import google.generativeai as genai
+import atexit
+import queue
+from logging.handlers import QueueHandler, QueueListener
 import configparser
 from pathlib import Path
 from datetime import datetime
@@ -25,10 +26,95 @@ import traceback
 import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
-from googleapiclient.discovery import build
-import requests
-from scholarly import scholarly
 import random
+from functools import lru_cache
+from collections import Counter, deque
+
+# Prefer orjson's native encoder; fall back to the stdlib so enrichment still runs without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+@lru_cache(maxsize=None)
+def enrichment_summary_schema():
+    """Flat columnar (one column per field) view of each enrichment, written next to the JSONL batch.
+    
+    Built on first use so importing this module does not pay for pyarrow.
+    """
+    import pyarrow as pa
+    
+    return pa.schema([
+        ("variety_name", pa.string()),
+        ("crop_type", pa.string()),
+        ("drought_level", pa.string()),
+        ("heat_level", pa.string()),
+        ("salinity_level", pa.string()),
+        ("flood_level", pa.string()),
+        ("submergence_level", pa.string()),
+        ("reliability_score", pa.int8()),
+        ("post_2008_pct", pa.float32()),
+        ("enrichment_ts", pa.timestamp("us")),
+    ])
+
+def dump_json_compact(data: Any) -> bytes:
+    """Encode data as compact UTF-8 JSON, stringifying values JSON cannot represent"""
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class JsonObjectScanner:
+    """Tracks brace depth across streamed chunks to detect when a JSON object is complete"""
+    
+    def __init__(self):
+        self.chunks = []
+        self.length = 0
+        self.start = None
+        self.end = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, text: str) -> bool:
+        """Consume a chunk; return True once the top-level object has been closed"""
+        offset = self.length
+        self.chunks.append(text)
+        self.length += len(text)
+        
+        for i, char in enumerate(text):
+            if self.start is None:
+                # Skip any preamble such as a ```json fence
+                if char == '{':
+                    self.start = offset + i
+                    self.depth = 1
+                continue
+            
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                self.depth += 1
+            elif char == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = offset + i + 1
+                    return True
+        
+        return False
+    
+    @property
+    def text(self) -> str:
+        """The completed JSON object, or everything received if it never closed"""
+        full_text = "".join(self.chunks)
+        if self.end is None:
+            return full_text
+        return full_text[self.start:self.end]
 
 class ContextEnricher:
     """
@@ -45,26 +131,21 @@ class ContextEnricher:
         self.setup_gemini_api()
         self.setup_directories()
         
-        # Processing statistics
-        self.stats = {
-            "total_varieties_loaded": 0,
-            "varieties_processed": 0,
-            "successful_enrichments": 0,
-            "failed_enrichments": 0,
-            "total_search_queries": 0,
-            "successful_queries": 0,
-            "failed_queries": 0,
-            "google_scholar_queries": 0,
-            "post_2008_results": 0,
-            "total_processing_time": 0,
-            "api_calls_made": 0,
-            "errors": []
-        }
+        # Processing statistics (shared across worker paths, guarded by _stats_lock)
+        self.stats = Counter()
+        self.errors = deque(maxlen=1000)
+        self._stats_lock = threading.Lock()
         
-        # Rate limiting
-        self.last_api_call = 0
-        self.min_delay = 1.0  # 1 second between API calls
-        self.scholar_delay = 2.0  # 2 seconds between Scholar queries
+        # Rate limiting: one token bucket per call type, shared across threads
+        gemini_qps = float(self.config.get("SETTINGS", {}).get("gemini_qps", 1.0))
+        if gemini_qps <= 0:
+            raise ValueError(f"💥 gemini_qps must be greater than 0, got {gemini_qps}")
+        self.rate_limits = {"api": gemini_qps}
+        self._rate_buckets = {
+            delay_type: {"tokens": 1.0, "updated": time.monotonic()}
+            for delay_type in self.rate_limits
+        }
+        self._rate_lock = threading.Lock()
         
         print(" Enhanced CSC-Seednet pipeline initialized successfully!")
 
@@ -85,22 +166,33 @@ class ContextEnricher:
             raise Exception(f"💥 Failed to load config from {config_path}: {e}")
 
     def setup_logging(self):
-        """Setup comprehensive logging system"""
+        """Setup queue-based logging so handlers run off the enrichment thread"""
         log_dir = Path(self.config.get('PATHS', {}).get('logs_dir', 'logs'))
         log_dir.mkdir(exist_ok=True)
         
-        log_file = log_dir / f"enhanced_csc_seednet_{self.session_start.strftime('%Y%m%d_%H%M%S')}.log"
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
         
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file),
-                logging.StreamHandler()
-            ]
-        )
+        # The module logger is shared by every enricher instance; attach the queue only once
+        # so repeated instantiation does not duplicate log lines
+        if not any(isinstance(handler, QueueHandler) for handler in self.logger.handlers):
+            log_file = log_dir / f"enhanced_csc_seednet_{self.session_start.strftime('%Y%m%d_%H%M%S')}.log"
+            
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            file_handler = logging.FileHandler(log_file)
+            file_handler.setFormatter(formatter)
+            stream_handler = logging.StreamHandler()
+            stream_handler.setFormatter(formatter)
+            
+            # The calling thread formats each record (QueueHandler.prepare) and enqueues it;
+            # file/stderr I/O happens on the listener's background thread
+            log_queue = queue.Queue(-1)
+            log_listener = QueueListener(log_queue, file_handler, stream_handler)
+            log_listener.start()
+            atexit.register(log_listener.stop)
+            self.logger.addHandler(QueueHandler(log_queue))
         
-        self.logger = logging.getLogger("EnhancedCSCSeednetPipeline")
         self.logger.info(" Enhanced logging system configured")
 
     def setup_gemini_api(self):
@@ -110,12 +202,25 @@ class ContextEnricher:
             if not api_key:
                 raise Exception("No Gemini API key found in config")
             
+            # Deferred so importing this module stays cheap when Gemini is not used
+            import google.generativeai as genai
+            from google.api_core import exceptions as google_exceptions
+            from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+            
             genai.configure(api_key=api_key)
             # Use pro model for enhanced analysis
             model_name = self.config.get("SETTINGS", {}).get("gemini_model", "gemini-2.5-flash")
             self.model = genai.GenerativeModel(model_name)
             
-            self.logger.info(f"🔑 Gemini API configured with pro model: {model_name}")
+            # Retry quota/availability errors with jittered exponential backoff
+            self._generate_with_retry = retry(
+                stop=stop_after_attempt(5),
+                wait=wait_exponential_jitter(initial=0.5, max=8),
+                retry=retry_if_exception_type((google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable)),
+                reraise=True,
+            )(self._stream_json_response)
+            
+            self.logger.info("🔑 Gemini API configured with pro model: %s", model_name)
             print(f"🔑 Gemini Pro API ready: {model_name}")
             
         except Exception as e:
@@ -135,20 +240,58 @@ class ContextEnricher:
         for dir_path in self.dirs.values():
             dir_path.mkdir(parents=True, exist_ok=True)
 
+    def get_stats_snapshot(self) -> Dict[str, int]:
+        """Return a point-in-time copy of the processing statistics"""
+        with self._stats_lock:
+            return dict(self.stats)
+
     def rate_limit(self, delay_type: str = "api"):
-        """Rate limiting for API calls"""
-        current_time = time.time()
-        if delay_type == "scholar":
-            delay = self.scholar_delay
-        else:
-            delay = self.min_delay
-        
-        time_since_last = current_time - self.last_api_call
-        if time_since_last < delay:
-            sleep_time = delay - time_since_last
+        """Block until the token bucket for this call type grants a request"""
+        rate = self.rate_limits.get(delay_type, self.rate_limits["api"])
+        capacity = max(1.0, rate)
+        
+        while True:
+            with self._rate_lock:
+                bucket = self._rate_buckets.setdefault(delay_type, {"tokens": 1.0, "updated": time.monotonic()})
+                now = time.monotonic()
+                bucket["tokens"] = min(capacity, bucket["tokens"] + (now - bucket["updated"]) * rate)
+                bucket["updated"] = now
+                
+                if bucket["tokens"] >= 1.0:
+                    bucket["tokens"] -= 1.0
+                    return
+                
+                sleep_time = (1.0 - bucket["tokens"]) / rate
+            
+            # Sleep outside the lock so other threads can refill/consume meanwhile
             time.sleep(sleep_time)
+
+    def generate_content(self, prompt: str) -> str:
+        """Rate-limited, streamed Gemini call, retried with backoff on quota/availability errors.
+        
+        Stops reading the stream as soon as the top-level JSON object is closed and
+        returns just that object; otherwise returns the full response text.
+        """
+        return self._generate_with_retry(prompt)
+
+    def _stream_json_response(self, prompt: str) -> str:
+        """Single attempt of generate_content"""
+        self.rate_limit("api")
         
-        self.last_api_call = time.time()
+        request_start = time.monotonic()
+        stream = self.model.generate_content(prompt, stream=True)
+        scanner = JsonObjectScanner()
+        first_chunk = True
+        
+        for chunk in stream:
+            if first_chunk:
+                self.logger.info("Gemini time to first token: %.2fs", time.monotonic() - request_start)
+                first_chunk = False
+            if scanner.feed(chunk.text):
+                break
+        
+        self.logger.info("Gemini response received in %.2fs", time.monotonic() - request_start)
+        return scanner.text
 
     def generate_pro_analysis_prompt(self) -> str:
         """Generate enhanced analysis prompt for pro mode Gemini"""
@@ -282,39 +425,80 @@ Analyze the provided search results comprehensively and return the complete stru
 
     def analyze_with_pro_gemini(self, variety_data: Dict[str, Any], search_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Analyze variety using pro mode Gemini with comprehensive search results"""
+        # Classify search results in a single pass
+        successful_queries = 0
+        has_evidence = False
+        google_scholar_results, google_search_results = [], []
+        for r in search_results:
+            if 'error' in r:
+                continue
+            successful_queries += 1
+            if r.get('title') or r.get('snippet'):
+                has_evidence = True
+            search_type = r.get('search_type')
+            if search_type == 'google_scholar':
+                google_scholar_results.append(r)
+            elif search_type == 'google_search':
+                google_search_results.append(r)
+        
+        # Nothing usable to analyze: skip the Gemini call and return a stub analysis
+        if not has_evidence:
+            self.logger.info("Skipping Gemini analysis for %s: no usable search results", variety_data.get('variety_name', 'Unknown'))
+            with self._stats_lock:
+                self.stats["skipped_empty"] += 1
+            return {
+                "variety_analysis": {
+                    "variety_name": variety_data.get('variety_name'),
+                    "overall_assessment": "insufficient_evidence"
+                },
+                "stress_tolerance_profile": {"overall_stress_tolerance": "unknown"},
+                "evidence_quality_assessment": {
+                    "total_sources": 0,
+                    "reliability_score": 0,
+                    "overall_evidence_quality": "low"
+                },
+                "processing_metadata": {
+                    "analysis_timestamp": datetime.now().isoformat(),
+                    "skipped": "no_search_results"
+                }
+            }
+        
         try:
-            self.rate_limit("api")
-            
             # Prepare comprehensive context
             search_context = {
                 "variety_information": variety_data,
                 "search_results": search_results,
                 "total_queries": len(search_results),
-                "successful_queries": len([r for r in search_results if 'error' not in r]),
-                "google_scholar_results": [r for r in search_results if r.get('search_type') == 'google_scholar'],
-                "google_search_results": [r for r in search_results if r.get('search_type') == 'google_search']
+                "successful_queries": successful_queries,
+                "google_scholar_results": google_scholar_results,
+                "google_search_results": google_search_results
             }
             
             prompt = self.generate_pro_analysis_prompt()
             
+            # Compact encoding (orjson when available): no indent padding in the prompt
+            variety_json = dump_json_compact(variety_data).decode()
+            search_context_json = dump_json_compact(search_context).decode()
+            
             # Create comprehensive input for Gemini Pro
             full_prompt = f"""
 {prompt}
 
 VARIETY TO ANALYZE:
-{json.dumps(variety_data, indent=2)}
+{variety_json}
 
 COMPREHENSIVE SEARCH RESULTS:
-{json.dumps(search_context, indent=2)}
+{search_context_json}
 
 Please analyze this variety comprehensively using all available search results and return the structured JSON analysis.
 """
             
-            response = self.model.generate_content(full_prompt)
-            self.stats["api_calls_made"] += 1
+            response_text = self.generate_content(full_prompt)
+            with self._stats_lock:
+                self.stats["api_calls_made"] += 1
             
             # Parse response
-            response_text = response.text.strip()
+            response_text = response_text.strip()
             if response_text.startswith("```json"):
                 response_text = response_text[7:-3].strip()
             elif response_text.startswith("```"):
@@ -327,14 +511,14 @@ Please analyze this variety comprehensively using all available search results a
                 "analysis_timestamp": datetime.now().isoformat(),
                 "gemini_model": self.config.get("SETTINGS", {}).get("gemini_model", "gemini-2.5-flash"),
                 "total_search_queries": len(search_results),
-                "successful_queries": len([r for r in search_results if 'error' not in r]),
+                "successful_queries": successful_queries,
                 "processing_version": "enhanced_csc_seednet_v1.0"
             }
             
             return analysis_result
             
         except Exception as e:
-            self.logger.error(f"Pro Gemini analysis failed: {e}")
+            self.logger.error("Pro Gemini analysis failed: %s", e)
             return {
                 "error": str(e),
                 "variety_name": variety_data.get('variety_name', 'Unknown'),
@@ -347,7 +531,7 @@ Please analyze this variety comprehensively using all available search results a
         context_path = Path(context_dir)
         
         if not context_path.exists():
-            self.logger.warning(f"Context directory not found: {context_dir}")
+            self.logger.warning("Context directory not found: %s", context_dir)
             return context_files
         
         # Find all JSON context files
@@ -358,18 +542,18 @@ Please analyze this variety comprehensively using all available search results a
                 with open(json_file, 'r') as f:
                     context_data = json.load(f)
                     context_files.append(context_data)
-                self.logger.info(f"Loaded context file: {json_file.name}")
+                self.logger.info("Loaded context file: %s", json_file.name)
             except Exception as e:
-                self.logger.error(f"Failed to load context file {json_file}: {e}")
+                self.logger.error("Failed to load context file %s: %s", json_file, e)
         
-        self.logger.info(f"Loaded {len(context_files)} context files")
+        self.logger.info("Loaded %d context files", len(context_files))
         return context_files
 
     def enrich_variety_from_context(self, variety_data: Dict[str, Any], context_data: Dict[str, Any]) -> Dict[str, Any]:
         """Enrich a single variety using its context data"""
         try:
             variety_name = variety_data.get('variety_name', 'Unknown')
-            self.logger.info(f" Enriching variety: {variety_name}")
+            self.logger.info(" Enriching variety: %s", variety_name)
             
             # Extract search results from context
             search_results = context_data.get('search_results', [])
@@ -385,20 +569,68 @@ Please analyze this variety comprehensively using all available search results a
                 "enrichment_timestamp": datetime.now().isoformat()
             }
             
-            self.logger.info(f" Successfully enriched: {variety_name}")
-            self.stats["successful_enrichments"] += 1
+            self.logger.info(" Successfully enriched: %s", variety_name)
+            with self._stats_lock:
+                self.stats["successful_enrichments"] += 1
             
             return enriched_data
             
         except Exception as e:
-            self.logger.error(f" Failed to enrich variety {variety_data.get('variety_name', 'Unknown')}: {e}")
-            self.stats["failed_enrichments"] += 1
-            self.stats["errors"].append(str(e))
+            self.logger.error(" Failed to enrich variety %s: %s", variety_data.get('variety_name', 'Unknown'), e)
+            with self._stats_lock:
+                self.stats["failed_enrichments"] += 1
+                self.errors.append(str(e))
             return None
 
+    def flatten_enrichment(self, enriched_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the scalar summary fields of an enrichment as a flat row.
+        
+        The analysis comes from LLM output, so every nested section and value is
+        type-checked: anything of the wrong shape becomes None instead of raising.
+        """
+        def as_dict(value):
+            return value if isinstance(value, dict) else {}
+        
+        def to_text(value):
+            if value is None or isinstance(value, (list, dict)):
+                return None
+            return value if isinstance(value, str) else str(value)
+        
+        def to_number(value, cast):
+            try:
+                return cast(value)
+            except (TypeError, ValueError, OverflowError):
+                return None
+        
+        original = as_dict(enriched_data.get("original_data"))
+        analysis = as_dict(enriched_data.get("analysis_result"))
+        variety_analysis = as_dict(analysis.get("variety_analysis"))
+        profile = as_dict(analysis.get("stress_tolerance_profile"))
+        evidence = as_dict(analysis.get("evidence_quality_assessment"))
+        
+        def tolerance_level(key):
+            return to_text(as_dict(profile.get(key)).get("tolerance_level"))
+        
+        reliability = to_number(evidence.get("reliability_score"), int)
+        if reliability is not None and not -128 <= reliability <= 127:
+            reliability = None
+        
+        return {
+            "variety_name": to_text(original.get("variety_name") or variety_analysis.get("variety_name")),
+            "crop_type": to_text(original.get("crop_type") or original.get("crop_name") or variety_analysis.get("crop_type")),
+            "drought_level": tolerance_level("drought_tolerance"),
+            "heat_level": tolerance_level("heat_tolerance"),
+            "salinity_level": tolerance_level("salinity_tolerance"),
+            "flood_level": tolerance_level("flood_tolerance"),
+            "submergence_level": tolerance_level("submergence_tolerance"),
+            "reliability_score": reliability,
+            "post_2008_pct": to_number(analysis.get("post_2008_content_percentage"), float),
+            "enrichment_ts": datetime.fromisoformat(enriched_data["enrichment_timestamp"]),
+        }
+
     def process_enrichment_batch(self, varieties: List[Dict[str, Any]], context_dir: str, batch_num: int = 1):
         """Process a batch of varieties for enrichment"""
-        self.logger.info(f" Processing enrichment batch {batch_num} with {len(varieties)} varieties")
+        self.logger.info(" Processing enrichment batch %d with %d varieties", batch_num, len(varieties))
         
         # Load context files
         context_files = self.load_context_files(context_dir)
@@ -408,6 +640,7 @@ Please analyze this variety comprehensively using all available search results a
             return []
         
         batch_results = []
+        summary_rows = []
         
         for variety in varieties:
             try:
@@ -424,22 +657,40 @@ Please analyze this variety comprehensively using all available search results a
                 if matching_context:
                     result = self.enrich_variety_from_context(variety, matching_context)
                     if result:
+                        # Flatten first so a malformed analysis cannot leave the JSONL and Parquet out of step
+                        summary_row = self.flatten_enrichment(result)
                         batch_results.append(result)
+                        summary_rows.append(summary_row)
                 else:
-                    self.logger.warning(f"No context found for variety: {variety_name}")
+                    self.logger.warning("No context found for variety: %s", variety_name)
                 
-                self.stats["varieties_processed"] += 1
+                with self._stats_lock:
+                    self.stats["varieties_processed"] += 1
                 
             except Exception as e:
-                self.logger.error(f"Batch enrichment error: {e}")
+                self.logger.error("Batch enrichment error: %s", e)
                 continue
         
-        # Save batch results
-        batch_file = self.dirs["processed_batches_200"] / f"enriched_batch_{batch_num}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(batch_file, 'w') as f:
-            json.dump(batch_results, f, indent=2)
+        # Save batch results as JSON Lines (one enriched record per line) for streaming consumers
+        batch_file = self.dirs["processed_batches_200"] / f"enriched_batch_{batch_num}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        with open(batch_file, 'wb') as f:
+            for result in batch_results:
+                f.write(dump_json_compact(result))
+                f.write(b"\n")
+        
+        # Save the flat summary table for column scans without parsing the JSON; the JSONL
+        # above is the primary output, so a failure here is logged rather than raised
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            
+            summary_table = pa.Table.from_pylist(summary_rows, schema=enrichment_summary_schema())
+            pq.write_table(summary_table, batch_file.with_suffix(".parquet"), compression="zstd")
+        except Exception as e:
+            self.logger.error("Failed to write summary Parquet for batch %d: %s", batch_num, e)
         
-        self.logger.info(f" Enrichment batch {batch_num} completed: {len(batch_results)} successful enrichments")
+        self.logger.info(" Enrichment batch %d completed: %d successful enrichments", batch_num, len(batch_results))
+        self.logger.info(" Processing statistics: %s", self.get_stats_snapshot())
         return batch_results
 
 def main():
@@ -6,19 +6,86 @@
 # Description: Generates the final structured database from enriched seed variety data.
 
 import pandas as pd
+import numpy as np
 import json
 import os
 import glob
 import re
 import configparser
-from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from datetime import datetime
 from pathlib import Path
 
+# Prefer orjson's native parser/encoder; fall back to the stdlib so the pipeline still runs without it
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
+# Variety name feature patterns; each takes the first match anywhere in the name
+# Example: Bitter Gourd C.v. DBGS-54
+VARIETY_FEATURE_PATTERNS = {
+    # The crop name is usually at the beginning
+    'variety_features.crop_name': re.compile(r'^([A-Za-z\s]+)'),
+    # Prefix (typically uppercase letters followed by a hyphen)
+    'variety_features.prefix': re.compile(r'([A-Z]+)-'),
+    # Numeric identifier, a strong key
+    'variety_features.numeric_id': re.compile(r'(\d+)'),
+    # Abbreviation (e.g., c.v., var.)
+    'variety_features.abbreviation': re.compile(r'([cv]\.?[v]?\.?)', re.IGNORECASE),
+}
+
 class FinalDatabaseGenerator:
     """Generates the final structured database from enriched seed variety data."""
     
+    # Essential columns for variety identification; also the key columns filled during cleaning
+    ESSENTIAL_COLS = (
+        'original_data.variety_name', 'original_data.crop_type',
+        'original_data.approval_status', 'analysis_result.variety_identification.variety_name'
+    )
+    
+    # Identifier columns used for variety identification and duplicate grouping
+    IDENTIFIER_COLS = ESSENTIAL_COLS + ('original_data.variety_standardized',)
+    
+    # Categories assigned by the duplicate analysis
+    DUPLICATE_CATEGORIES = ['Unique', 'Exact Match', 'Related but Distinct', 'Typo/Formatting Issue']
+    
+    # Vocabulary of the stress_tolerance_* columns
+    TOLERANCE_LEVELS = ['high', 'medium', 'low', 'unknown']
+    
+    # Enriched batch files, relative to the research context directory: the
+    # processed_batches_200/enriched_batch_<n>_<ts> files written by enrich_from_context.py,
+    # and the top-level batch_<n>_enriched naming used by earlier runs
+    BATCH_FILE_GLOBS = (os.path.join('processed_batches_200', 'enriched_batch_*'), 'batch_*_enriched')
+    
+    # Source columns mapped onto the final database schema
+    COLUMN_MAPPING = {
+        'original_data.variety_name': 'variety_name',
+        'original_data.crop_type': 'crop_type',
+        'original_data.approval_status': 'approval_status',
+        'analysis_result.stress_tolerance_profile.drought_tolerance.tolerance_level': 'stress_tolerance_drought',
+        'analysis_result.stress_tolerance_profile.heat_tolerance.tolerance_level': 'stress_tolerance_heat',
+        'analysis_result.stress_tolerance_profile.salinity_tolerance.tolerance_level': 'stress_tolerance_salinity',
+        'analysis_result.stress_tolerance_profile.flood_tolerance.tolerance_level': 'stress_tolerance_flood',
+        'analysis_result.stress_tolerance_profile.disease_resistance.tolerance_level': 'stress_tolerance_disease',
+        'analysis_result.stress_tolerance_profile.pest_resistance.tolerance_level': 'stress_tolerance_pest',
+        'analysis_result.genetic_and_molecular_profile.molecular_markers': 'genetic_markers',
+        'analysis_result.genetic_and_molecular_profile.qtl_mapping': 'qtl_information',
+        'analysis_result.agronomic_performance.yield_data': 'yield_potential',
+        'analysis_result.agronomic_performance.maturity_days': 'maturity_days',
+        'analysis_result.research_and_development.development_institution': 'development_institution',
+        'analysis_result.research_and_development.breeder_information': 'principal_breeder',
+        'analysis_result.research_and_development.testing_locations': 'testing_locations',
+        'analysis_result.commercial_availability.seed_availability': 'commercial_availability',
+        'analysis_result.evidence_quality_assessment.reliability_score': 'evidence_quality_score',
+        'analysis_result.evidence_quality_assessment.peer_reviewed_sources': 'peer_reviewed_sources',
+        'analysis_result.evidence_quality_assessment.total_sources': 'total_sources',
+        'enrichment_timestamp': 'processing_timestamp'
+    }
+    
     def __init__(self, config_path='../config/config.ini'):
         """Initialize the database generator with configuration."""
         self.config = self._load_config(config_path)
@@ -28,6 +95,9 @@ class FinalDatabaseGenerator:
         # Configuration
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
+        # Number of batch files found by load_and_consolidate_data
+        self.batch_file_count = 0
+        
     def _load_config(self, config_path):
         """Load configuration from config file."""
         config = configparser.ConfigParser()
@@ -65,35 +135,101 @@ class FinalDatabaseGenerator:
         self.logger.info(f"--- Phase I: Data Consolidation and Initial Profiling ---")
         self.logger.info(f"Starting data consolidation from: {data_dir}")
         
-        json_files = glob.glob(os.path.join(data_dir, 'batch_*_enriched.json'))
-        if not json_files:
+        # Batches are JSON Lines (one record per line) or, from older runs, a JSON list per file
+        batch_files = []
+        for pattern in self.BATCH_FILE_GLOBS:
+            for extension in ('.jsonl', '.json'):
+                batch_files += sorted(glob.glob(os.path.join(data_dir, pattern + extension)))
+        self.batch_file_count = len(batch_files)
+        if not batch_files:
             self.logger.error("No batch files found. Please check the DATA_DIR path.")
             return pd.DataFrame()
 
-        self.logger.info(f"Found {len(json_files)} batch files to process.")
+        self.logger.info(f"Found {len(batch_files)} batch files to process.")
         
-        all_records = []
-        for file_path in json_files:
-            try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                    # Each file contains a list of records; extend the main list
-                    all_records.extend(data)
-            except json.JSONDecodeError:
-                self.logger.warning(f"Could not decode JSON from {file_path}. Skipping.")
-            except Exception as e:
-                self.logger.error(f"Error reading {file_path}: {e}")
+        # Read, parse and flatten batch files concurrently so disk reads overlap across files.
+        # Each file is reduced to its needed columns as soon as it is parsed, so the full
+        # nested records of every batch are never held in memory together.
+        with ThreadPoolExecutor(max_workers=min(32, len(batch_files))) as executor:
+            batch_frames = [frame for frame in executor.map(self._load_batch_file, batch_files) if not frame.empty]
 
-        if not all_records:
+        if not batch_frames:
             self.logger.error("No records were loaded. Exiting.")
             return pd.DataFrame()
 
-        # Normalize the nested JSON structure into a flat DataFrame
-        df = pd.json_normalize(all_records)
+        df = pd.concat(batch_frames, ignore_index=True)
+        df = df[[col for col in self._source_columns() if col in df.columns]]
         
         self.logger.info(f"Successfully consolidated {len(df)} records into a DataFrame.")
         return df
 
+    def _source_columns(self):
+        """
+        Returns the dotted source columns read by the later pipeline phases.
+        """
+        return list(dict.fromkeys(self.IDENTIFIER_COLS + tuple(self.COLUMN_MAPPING)))
+
+    def _extract_source_columns(self, records):
+        """
+        Builds a flat DataFrame of the known dotted columns in a single pass over the records.
+        """
+        paths = [(col, col.split('.')) for col in self._source_columns()]
+        columns = {col: [] for col, _ in paths}
+        present = set()
+
+        for record in records:
+            for col, path in paths:
+                value = record
+                for key in path:
+                    value = value.get(key) if isinstance(value, dict) else None
+                    if value is None:
+                        break
+                # json_normalize splits a dict leaf into sub-columns, leaving nothing at its own path
+                if isinstance(value, dict):
+                    value = None
+                columns[col].append(value)
+                if value is not None:
+                    present.add(col)
+
+        # Like json_normalize, only emit columns that occur in the data
+        return pd.DataFrame({col: values for col, values in columns.items() if col in present})
+
+    def _load_batch_file(self, file_path):
+        """
+        Loads a single batch file as a flat DataFrame of the needed columns, empty on failure.
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                if file_path.endswith('.jsonl'):
+                    records = self._parse_json_lines(f, file_path)
+                else:
+                    # Each file contains a list of records
+                    records = json_loads(f.read())
+            # Flatten only the nested fields used downstream instead of normalizing every key
+            return self._extract_source_columns(records)
+        except json.JSONDecodeError:  # orjson.JSONDecodeError subclasses this
+            self.logger.warning(f"Could not decode JSON from {file_path}. Skipping.")
+        except Exception as e:
+            self.logger.error(f"Error reading {file_path}: {e}")
+        return pd.DataFrame()
+
+    def _parse_json_lines(self, lines, file_path):
+        """
+        Parses one record per line, skipping blank and malformed lines.
+        """
+        records = []
+        skipped = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                records.append(json_loads(line))
+            except json.JSONDecodeError:
+                skipped += 1
+        if skipped:
+            self.logger.warning(f"Skipped {skipped} malformed lines in {file_path}.")
+        return records
+
     def initial_data_profiling(self, df):
         """
         Performs an initial EDA on the DataFrame.
@@ -108,26 +244,24 @@ class FinalDatabaseGenerator:
         # Summarize column data types and missing values
         
         # Handle potential unhashable types (like lists) in columns for nunique()
-        unique_values = {}
-        for col in df.columns:
-            try:
-                unique_values[col] = df[col].nunique()
-            except TypeError:
-                unique_values[col] = "unhashable_list" # Mark columns with unhashable types
-
+        object_cols = df.columns[df.dtypes == object]
+        unhashable_cols = [col for col in object_cols if df[col].map(type).isin([list, dict]).any()]
+        unique_values = pd.concat([
+            df.drop(columns=unhashable_cols).nunique().astype(object),
+            pd.Series("unhashable_list", index=unhashable_cols, dtype=object)  # Mark columns with unhashable types
+        ]).reindex(df.columns)
+
+        missing_values = df.isnull().sum()
         profile = pd.DataFrame({
             'Dtype': df.dtypes,
-            'Missing Values': df.isnull().sum(),
-            'Missing (%)': (df.isnull().sum() / len(df)) * 100,
-            'Unique Values': pd.Series(unique_values)
+            'Missing Values': missing_values,
+            'Missing (%)': (missing_values / len(df)) * 100,
+            'Unique Values': unique_values
         })
         self.logger.info("Data Profile:\n" + profile.to_string())
 
         # Identify essential columns for variety identification
-        essential_cols = [
-            'original_data.variety_name', 'original_data.crop_type', 
-            'original_data.approval_status', 'analysis_result.variety_identification.variety_name'
-        ]
+        essential_cols = list(self.ESSENTIAL_COLS)
         self.logger.info(f"\nEssential columns for variety identification: {essential_cols}")
         for col in essential_cols:
             if col not in df.columns:
@@ -142,24 +276,25 @@ class FinalDatabaseGenerator:
         self.logger.info(f"\n--- Phase II: Data Cleaning and Standardization ---")
         
         # Standardize Key Fields by applying functions only to string elements
-        for col in df.select_dtypes(include=['object']).columns:
-            # Use .apply() to handle mixed types gracefully.
-            # It operates element-wise, so we can check the type.
-            df[col] = df[col].apply(lambda x: x.strip() if isinstance(x, str) else x)
+        for col in df.select_dtypes(include=['object', 'string']).columns:
+            title_case = 'name' in col.lower() or 'crop' in col.lower()
             
-            # Enforce consistent casing for specific fields
-            if 'name' in col.lower() or 'crop' in col.lower():
-                df[col] = df[col].apply(lambda x: x.title() if isinstance(x, str) else x)
+            if pd.api.types.infer_dtype(df[col], skipna=True) == 'string':
+                # Pure string columns use the vectorized .str methods (NaNs pass through)
+                df[col] = df[col].str.strip()
+                if title_case:
+                    df[col] = df[col].str.title()
+            else:
+                # Mixed columns (e.g. lists alongside strings) fall back to element-wise handling,
+                # since .str would turn the non-string values into NaN
+                df[col] = df[col].apply(lambda x: x.strip() if isinstance(x, str) else x)
+                if title_case:
+                    df[col] = df[col].apply(lambda x: x.title() if isinstance(x, str) else x)
 
         # Address Missing Data
         # For this analysis, we'll fill key categorical columns with 'Unknown'
-        key_cols = [
-            'original_data.variety_name', 'original_data.crop_type', 
-            'original_data.approval_status', 'analysis_result.variety_identification.variety_name'
-        ]
-        for col in key_cols:
-            if col in df.columns:
-                df[col].fillna('Unknown', inplace=True)
+        fill_map = {col: 'Unknown' for col in self.ESSENTIAL_COLS if col in df.columns}
+        df = df.fillna(fill_map)
                 
         self.logger.info("Data cleaning and standardization complete.")
         return df
@@ -176,35 +311,36 @@ class FinalDatabaseGenerator:
         if variety_col not in df.columns:
             variety_col = 'original_data.variety_name'
 
-        def parse_variety_name(name):
-            if not isinstance(name, str):
-                return "Unknown", "Unknown", "Unknown", "Unknown"
-            
-            # General pattern: Crop Name (optional), Prefix (optional), Numeric ID (optional)
-            # Example: Bitter Gourd C.v. DBGS-54
-            
-            # Extract numeric identifier first, as it's a strong key
-            numeric_id_match = re.search(r'(\d+)', name)
-            numeric_id = numeric_id_match.group(1) if numeric_id_match else "Unknown"
-            
-            # Extract prefix (typically uppercase letters followed by a hyphen)
-            prefix_match = re.search(r'([A-Z]+)-', name)
-            prefix = prefix_match.group(1) if prefix_match else "Unknown"
-
-            # Extract abbreviation (e.g., c.v., var.)
-            abbr_match = re.search(r'([cv]\.?[v]?\.?)', name, re.IGNORECASE)
-            abbr = abbr_match.group(1) if abbr_match else "Unknown"
+        names = df[variety_col]
+        if pd.api.types.infer_dtype(names, skipna=True) not in ('string', 'empty', 'mixed', 'mixed-integer'):
+            # No string values to parse; every feature will be 'Unknown'
+            names = pd.Series(np.nan, index=df.index, dtype=object)
 
-            # The crop name is usually at the beginning
-            crop_name_match = re.match(r'^[A-Za-z\s]+', name)
-            crop_name = crop_name_match.group(0).strip() if crop_name_match else "Unknown"
-            
-            return crop_name, prefix, numeric_id, abbr
-
-        df[[
-            'variety_features.crop_name', 'variety_features.prefix',
-            'variety_features.numeric_id', 'variety_features.abbreviation'
-        ]] = df[variety_col].apply(lambda x: pd.Series(parse_variety_name(x)))
+        # Parse each distinct name only once; missing names get code -1
+        try:
+            codes, uniques = pd.factorize(names)
+        except TypeError:
+            # Unhashable values (e.g. lists) in the column: parse every row instead
+            codes, uniques = np.arange(len(names)), names.to_numpy()
+        unique_names = pd.Series(uniques, dtype=object)
+
+        # One vectorized extract per feature; non-string names and non-matches become NaN
+        unique_features = pd.DataFrame({
+            feature_col: unique_names.str.extract(pattern, expand=False)
+            for feature_col, pattern in VARIETY_FEATURE_PATTERNS.items()
+        }, index=unique_names.index)
+        unique_features['variety_features.crop_name'] = unique_features['variety_features.crop_name'].str.strip()
+
+        # A trailing all-NaN row is what code -1 (missing name) selects
+        unique_features = pd.concat([unique_features, pd.DataFrame(np.nan, index=[len(unique_features)], columns=unique_features.columns)])
+        unique_features = unique_features.astype(object).fillna('Unknown')
+
+        # Broadcast the per-name features back onto every row and attach them as one block
+        feature_df = pd.DataFrame({
+            feature_col: unique_features[feature_col].to_numpy()[codes]
+            for feature_col in VARIETY_FEATURE_PATTERNS
+        }, index=df.index)
+        df = pd.concat([df, feature_df], axis=1)
         
         self.logger.info("Feature engineering complete.")
         return df
@@ -214,7 +350,6 @@ class FinalDatabaseGenerator:
         Analyzes and categorizes duplicates based on agronomic rules.
         """
         self.logger.info("Step 2 & 3: Analyzing duplicates with agronomic intelligence...")
-        df['duplicate_analysis.category'] = 'Unique'
         df['duplicate_analysis.match_id'] = -1
         
         # Use a more reliable column for grouping
@@ -222,43 +357,57 @@ class FinalDatabaseGenerator:
         if grouping_col not in df.columns:
             grouping_col = 'analysis_result.variety_identification.variety_name'
 
-        grouped = df.groupby(grouping_col)
-        
-        match_id_counter = 0
-        categories = Counter()
-
-        for name, group in grouped:
-            if len(group) > 1:
-                # All items in this group are at least related.
-                indices = group.index
-                df.loc[indices, 'duplicate_analysis.match_id'] = match_id_counter
-
-                # Rule-based classification
-                # Check for exact matches first
-                if group.duplicated(subset=['variety_features.prefix', 'variety_features.numeric_id'], keep=False).all():
-                     df.loc[indices, 'duplicate_analysis.category'] = 'Exact Match'
-                     categories['Exact Match'] += len(indices)
-                else:
-                    # If prefixes match but numeric IDs differ, they are related but distinct
-                    is_related_distinct = False
-                    if len(group['variety_features.prefix'].unique()) == 1 and len(group['variety_features.numeric_id'].unique()) > 1:
-                         is_related_distinct = True
-
-                    if is_related_distinct:
-                        df.loc[indices, 'duplicate_analysis.category'] = 'Related but Distinct'
-                        categories['Related but Distinct'] += len(indices)
-                    else:
-                        # High similarity but not exact match -> Typo/Formatting
-                        df.loc[indices, 'duplicate_analysis.category'] = 'Typo/Formatting Issue'
-                        categories['Typo/Formatting Issue'] += len(indices)
-
-                match_id_counter += 1
+        # Group on integer category codes rather than hashing Python strings
+        df[grouping_col] = df[grouping_col].astype('category')
+        for feature_col in ['variety_features.prefix', 'variety_features.numeric_id', 'variety_features.abbreviation']:
+            df[feature_col] = df[feature_col].astype('category')
+
+        grouped = df.groupby(grouping_col, observed=True, sort=False)
+        pair_cols = ['variety_features.prefix', 'variety_features.numeric_id']
+
+        # Group sizes straight from the category codes; rows with a missing
+        # grouping key (code -1) are never in a duplicate group and stay 'Unique'.
+        group_codes = df[grouping_col].cat.codes.to_numpy()
+        has_key = group_codes >= 0
+        group_sizes = np.bincount(group_codes[has_key], minlength=len(df[grouping_col].cat.categories))
+        in_duplicate_group = pd.Series(has_key, index=df.index)
+        in_duplicate_group[has_key] = group_sizes[group_codes[has_key]] > 1
+
+        # Per-row group statistics, computed column-wise instead of looping over groups
+        prefix_count = grouped['variety_features.prefix'].transform('nunique')
+        numeric_id_count = grouped['variety_features.numeric_id'].transform('nunique')
+
+        # Exact match: every row in the group shares its prefix/numeric ID pair with another row.
+        # The pair is encoded once as a single integer from the category codes (-1 for NaN).
+        prefix_codes = df[pair_cols[0]].cat.codes.to_numpy(dtype=np.int64) + 1
+        numeric_id_codes = df[pair_cols[1]].cat.codes.to_numpy(dtype=np.int64) + 1
+        pair_key = prefix_codes * (len(df[pair_cols[1]].cat.categories) + 1) + numeric_id_codes
+        pair_size = df.groupby([df[grouping_col], pair_key], observed=True, sort=False)[grouping_col].transform('size')
+        all_paired = pair_size.gt(1).groupby(df[grouping_col], observed=True, sort=False).transform('all').eq(True)
+
+        # Rule-based classification, in priority order
+        conditions = [
+            ~in_duplicate_group,
+            all_paired,
+            # If prefixes match but numeric IDs differ, they are related but distinct
+            prefix_count.eq(1) & numeric_id_count.gt(1),
+        ]
+        choices = ['Unique', 'Exact Match', 'Related but Distinct']
+        # High similarity but not exact match -> Typo/Formatting
+        df['duplicate_analysis.category'] = np.select(conditions, choices, default='Typo/Formatting Issue')
+
+        # All items in a duplicate group are at least related and share a match ID,
+        # numbered in sorted key order (category codes follow the sorted categories)
+        df.loc[in_duplicate_group, 'duplicate_analysis.match_id'] = (
+            pd.factorize(group_codes[in_duplicate_group.to_numpy()], sort=True)[0]
+        )
 
-        unique_count = len(df[df['duplicate_analysis.category'] == 'Unique'])
-        categories['Unique'] = unique_count
+        df['duplicate_analysis.category'] = df['duplicate_analysis.category'].astype(pd.CategoricalDtype(self.DUPLICATE_CATEGORIES))
+        # Counting the categorical reports every category, including empty ones
+        categories = df['duplicate_analysis.category'].value_counts(sort=False).to_dict()
         
         self.logger.info(f"Duplicate analysis complete. Summary: {categories}")
-        return df, dict(categories)
+        return df, categories
 
     def consolidate_duplicates(self, df):
         """
@@ -315,41 +464,28 @@ class FinalDatabaseGenerator:
         # Create final DataFrame with standardized columns
         final_df = pd.DataFrame()
         
-        # Map existing columns to final schema
-        column_mapping = {
-            'original_data.variety_name': 'variety_name',
-            'original_data.crop_type': 'crop_type',
-            'original_data.approval_status': 'approval_status',
-            'analysis_result.stress_tolerance_profile.drought_tolerance.tolerance_level': 'stress_tolerance_drought',
-            'analysis_result.stress_tolerance_profile.heat_tolerance.tolerance_level': 'stress_tolerance_heat',
-            'analysis_result.stress_tolerance_profile.salinity_tolerance.tolerance_level': 'stress_tolerance_salinity',
-            'analysis_result.stress_tolerance_profile.flood_tolerance.tolerance_level': 'stress_tolerance_flood',
-            'analysis_result.stress_tolerance_profile.disease_resistance.tolerance_level': 'stress_tolerance_disease',
-            'analysis_result.stress_tolerance_profile.pest_resistance.tolerance_level': 'stress_tolerance_pest',
-            'analysis_result.genetic_and_molecular_profile.molecular_markers': 'genetic_markers',
-            'analysis_result.genetic_and_molecular_profile.qtl_mapping': 'qtl_information',
-            'analysis_result.agronomic_performance.yield_data': 'yield_potential',
-            'analysis_result.agronomic_performance.maturity_days': 'maturity_days',
-            'analysis_result.research_and_development.development_institution': 'development_institution',
-            'analysis_result.research_and_development.breeder_information': 'principal_breeder',
-            'analysis_result.research_and_development.testing_locations': 'testing_locations',
-            'analysis_result.commercial_availability.seed_availability': 'commercial_availability',
-            'analysis_result.evidence_quality_assessment.reliability_score': 'evidence_quality_score',
-            'analysis_result.evidence_quality_assessment.peer_reviewed_sources': 'peer_reviewed_sources',
-            'analysis_result.evidence_quality_assessment.total_sources': 'total_sources',
-            'enrichment_timestamp': 'processing_timestamp'
-        }
-        
         # Map columns that exist in the source DataFrame
-        for source_col, target_col in column_mapping.items():
+        for source_col, target_col in self.COLUMN_MAPPING.items():
             if source_col in df.columns:
                 final_df[target_col] = df[source_col]
             else:
                 final_df[target_col] = 'Unknown'
         
+        # Store tolerance levels as a fixed-vocabulary categorical (one code per row instead of a string)
+        tolerance_dtype = pd.CategoricalDtype(self.TOLERANCE_LEVELS)
+        for col in [c for c in final_df.columns if c.startswith('stress_tolerance_')]:
+            levels = final_df[col].astype(object)
+            is_text = levels.map(type).eq(str)
+            levels = levels.where(~is_text, levels[is_text].str.strip().str.lower())
+            # Values outside the vocabulary, including non-string values, are recorded as
+            # 'unknown' rather than dropped to NaN
+            levels = levels.where(levels.isna() | levels.isin(self.TOLERANCE_LEVELS), 'unknown')
+            final_df[col] = levels.astype(tolerance_dtype)
+        final_df['approval_status'] = final_df['approval_status'].astype('category')
+        
         # Add variety_id
-        final_df['variety_id'] = range(1, len(final_df) + 1)
-        final_df['variety_id'] = final_df['variety_id'].apply(lambda x: f"STS_{x:06d}")
+        variety_numbers = pd.Series(np.arange(1, len(final_df) + 1), index=final_df.index)
+        final_df['variety_id'] = 'STS_' + variety_numbers.astype(str).str.zfill(6)
         
         # Reorder columns to put variety_id first
         cols = ['variety_id'] + [col for col in final_df.columns if col != 'variety_id']
@@ -358,13 +494,48 @@ class FinalDatabaseGenerator:
         self.logger.info(f"Final schema generated with {len(final_df.columns)} columns")
         return final_df, final_schema
 
+    def _parquet_compatible(self, df):
+        """
+        Returns a view of the DataFrame that Arrow can write: in object columns holding
+        lists, dicts or more than one Python type (e.g. numbers and 'Unknown' strings), the
+        non-string values are encoded as JSON text so consumers can parse them back. Nested
+        values are never left to Arrow's type inference, so such columns are always strings.
+        """
+        df = df.copy(deep=False)
+        for col in df.columns[df.dtypes == object]:
+            value_types = df[col].dropna().map(type)
+            if value_types.isin([list, dict]).any() or value_types.nunique() > 1:
+                df[col] = df[col].map(self._json_text, na_action='ignore')
+        return df
+
+    def _json_text(self, value):
+        """
+        Returns strings unchanged and any other value as compact JSON text.
+        """
+        if isinstance(value, str):
+            return value
+        if orjson is not None:
+            return orjson.dumps(value, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        return json.dumps(value, default=str)
+
+    def _write_json(self, data, path):
+        """
+        Writes an indented JSON document, using orjson when it is installed.
+        """
+        if orjson is not None:
+            with open(path, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=2, default=str)
+
     def generate_summary_report(self, original_df, final_df, analysis_summary):
         """
         Generates a summary report of the analysis.
         """
         self.logger.info(f"\n--- Summary Report ---")
         self.logger.info(f"Initial State:")
-        self.logger.info(f"  - Total Batches Processed: {len(glob.glob(os.path.join(self.data_dir, 'batch_*_enriched.json')))}")
+        self.logger.info(f"  - Total Batches Processed: {self.batch_file_count}")
         self.logger.info(f"  - Initial Row Count: {len(original_df)}")
         
         self.logger.info(f"\nCleaning and Standardization:")
@@ -396,8 +567,7 @@ class FinalDatabaseGenerator:
         }
         
         report_path = os.path.join(self.output_dir, f'summary_report_{self.timestamp}.json')
-        with open(report_path, 'w') as f:
-            json.dump(report, f, indent=4)
+        self._write_json(report, report_path)
         
         self.logger.info(f"Summary report saved to: {report_path}")
 
@@ -414,25 +584,26 @@ class FinalDatabaseGenerator:
                 self.logger.error("No data loaded. Exiting.")
                 return None
 
-            initial_profile = self.initial_data_profiling(master_df.copy())
+            initial_profile = self.initial_data_profiling(master_df)
             profile_path = os.path.join(self.output_dir, f'initial_data_profile_{self.timestamp}.csv')
             initial_profile.to_csv(profile_path)
             self.logger.info(f"Initial data profile saved to: {profile_path}")
 
             # Phase II: Clean and standardize
-            cleaned_df = self.clean_and_standardize_data(master_df.copy())
+            # Phases modify and return the same frame, so no defensive copies are taken;
+            # master_df is only used for its row count afterwards
+            cleaned_df = self.clean_and_standardize_data(master_df)
 
             # Phase III: Feature engineering and duplicate analysis
-            featured_df = self.engineer_variety_features(cleaned_df.copy())
-            analyzed_df, analysis_summary = self.analyze_duplicates(featured_df.copy())
+            featured_df = self.engineer_variety_features(cleaned_df)
+            analyzed_df, analysis_summary = self.analyze_duplicates(featured_df)
             
             analysis_report_path = os.path.join(self.output_dir, f'duplicates_analysis_{self.timestamp}.json')
-            with open(analysis_report_path, 'w') as f:
-                json.dump(analysis_summary, f, indent=4)
+            self._write_json(analysis_summary, analysis_report_path)
             self.logger.info(f"Duplicate analysis summary saved to: {analysis_report_path}")
 
             # Phase IV: Consolidate duplicates
-            final_df = self.consolidate_duplicates(analyzed_df.copy())
+            final_df = self.consolidate_duplicates(analyzed_df)
             
             # Phase V: Generate final schema
             final_schema_df, final_schema = self.generate_final_schema(final_df)
@@ -442,10 +613,20 @@ class FinalDatabaseGenerator:
             final_schema_df.to_csv(final_dataset_path, index=False)
             self.logger.info(f"Final database saved to: {final_dataset_path}")
             
+            # Columnar, compressed copy for analytics consumers. The CSV above is the primary
+            # output, so a failure here is logged rather than raised.
+            final_parquet_path = os.path.join(self.output_dir, f'stress_tolerant_seed_database_{self.timestamp}.parquet')
+            try:
+                self._parquet_compatible(final_schema_df).to_parquet(
+                    final_parquet_path, engine='pyarrow', compression='zstd', index=False
+                )
+                self.logger.info(f"Final database (Parquet) saved to: {final_parquet_path}")
+            except Exception as e:
+                self.logger.error(f"Failed to write final database Parquet: {e}")
+            
             # Save schema documentation
             schema_path = os.path.join(self.output_dir, f'database_schema_{self.timestamp}.json')
-            with open(schema_path, 'w') as f:
-                json.dump(final_schema, f, indent=4)
+            self._write_json(final_schema, schema_path)
             self.logger.info(f"Database schema saved to: {schema_path}")
 
             # Generate summary report